@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "store.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -135,6 +136,15 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 
+# Metrics: set to a shared directory to aggregate counters across worker processes.
+# The directory must be emptied before every (re)start of the application.
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR')
+METRICS_FLUSH_INTERVAL = 1.0
+# /metrics/ is visible to staff only, unless a scraper token or addresses are configured.
+# Behind a reverse proxy every request comes from loopback, so do not list it here.
+METRICS_BEARER_TOKEN = os.environ.get('METRICS_BEARER_TOKEN')
+METRICS_ALLOWED_IPS = []
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
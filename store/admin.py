@@ -1,6 +1,42 @@
 # store/admin.py
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.models import User
+from django.template.response import TemplateResponse
 from .models import Movie, Review, Order, OrderItem
+from .purge import movie_purge_counts, purge_movies, purge_users, user_purge_counts
+
+def _purge_selected(modeladmin, request, queryset, counts, purge):
+    """Confirm, check cascade permissions, log and run a batched purge"""
+    opts = modeladmin.model._meta
+    counts = counts(queryset)
+
+    # Like delete_selected, require delete permission on every model the cascade touches
+    perms_needed = []
+    for model in (Review, OrderItem, Order):
+        related_admin = modeladmin.admin_site._registry.get(model)
+        if counts.get(model._meta.label) and not (related_admin and related_admin.has_delete_permission(request)):
+            perms_needed.append(model._meta.verbose_name_plural)
+
+    if request.POST.get('post') and not perms_needed:
+        for obj in queryset:
+            modeladmin.log_deletion(request, obj, str(obj))
+        counts = purge(queryset)
+        summary = ', '.join(f'{count} {label}' for label, count in counts.items() if count)
+        modeladmin.message_user(request, f'Purged {summary or "nothing"}.', messages.SUCCESS)
+        return None
+
+    return TemplateResponse(request, 'admin/store/purge_confirmation.html', {
+        **modeladmin.admin_site.each_context(request),
+        'title': 'Are you sure?',
+        'opts': opts,
+        'queryset': queryset,
+        'counts': counts.items(),
+        'perms_needed': perms_needed,
+        'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        'media': modeladmin.media,
+    })
 
 @admin.register(Movie)
 class MovieAdmin(admin.ModelAdmin):
@@ -8,6 +44,11 @@ class MovieAdmin(admin.ModelAdmin):
     list_filter = ['created_at']
     search_fields = ['title']
     ordering = ['title']
+    actions = ['purge_selected']
+
+    @admin.action(description='Purge selected movies with their reviews and order items', permissions=['delete'])
+    def purge_selected(self, request, queryset):
+        return _purge_selected(self, request, queryset, movie_purge_counts, purge_movies)
 
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
@@ -24,4 +65,17 @@ class OrderAdmin(admin.ModelAdmin):
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ['order', 'movie', 'quantity', 'price']
-    list_filter = ['order__created_at']
\ No newline at end of file
+    list_filter = ['order__created_at']
+
+admin.site.unregister(User)
+
+@admin.register(User)
+class StoreUserAdmin(UserAdmin):
+    actions = ['purge_selected']
+
+    @admin.action(description='Purge selected users with their reviews and orders', permissions=['delete'])
+    def purge_selected(self, request, queryset):
+        if queryset.filter(pk=request.user.pk).exists() or queryset.filter(is_superuser=True).exists():
+            self.message_user(request, 'Your own account and superusers cannot be purged.', messages.ERROR)
+            return None
+        return _purge_selected(self, request, queryset, user_purge_counts, purge_users)
@@ -0,0 +1,78 @@
+# store/management/commands/purge.py
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+
+from store.models import Movie
+from store.purge import (
+    DEFAULT_BATCH_SIZE, movie_purge_counts, open_archive, purge_movies, purge_users, user_purge_counts,
+)
+
+
+class Command(BaseCommand):
+    help = 'Delete movies or users and their cascaded rows in small batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--movie', type=int, action='append', default=[], dest='movies',
+                            help='Movie id to purge (may be repeated).')
+        parser.add_argument('--user', type=int, action='append', default=[], dest='users',
+                            help='User id to purge (may be repeated).')
+        parser.add_argument('--inactive-days', type=int,
+                            help='Purge non-staff users who have not logged in for this many days.')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='Rows deleted per transaction.')
+        parser.add_argument('--archive', metavar='PATH',
+                            help='Append deleted rows to this owner-only file as JSON lines before removing them.')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Do not prompt the user for confirmation.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only print how many rows would be deleted.')
+
+    def handle(self, *args, **options):
+        if not options['movies'] and not options['users'] and options['inactive_days'] is None:
+            raise CommandError('Nothing to purge: pass --movie, --user or --inactive-days.')
+
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive.')
+
+        user_filter = Q(pk__in=options['users'])
+        if options['inactive_days'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['inactive_days'])
+            user_filter |= Q(is_staff=False, is_superuser=False) & (
+                Q(last_login__lt=cutoff) | Q(last_login__isnull=True, date_joined__lt=cutoff)
+            )
+        users = User.objects.filter(user_filter)
+        movies = Movie.objects.filter(pk__in=options['movies'])
+
+        planned = {}
+        for label, count in [*movie_purge_counts(movies).items(), *user_purge_counts(users).items()]:
+            planned[label] = planned.get(label, 0) + count
+        for label, count in planned.items():
+            self.stdout.write(f'{label}: {count} to delete')
+        if options['dry_run']:
+            return
+
+        if options['interactive']:
+            confirm = input(
+                'This will permanently delete the rows listed above.\n'
+                "Type 'yes' to continue, or 'no' to cancel: "
+            )
+            if confirm != 'yes':
+                self.stdout.write('Purge cancelled.')
+                return
+
+        archive = open_archive(options['archive']) if options['archive'] else None
+        try:
+            counts = purge_movies(movies, options['batch_size'], archive)
+            for label, count in purge_users(users, options['batch_size'], archive).items():
+                counts[label] = counts.get(label, 0) + count
+        finally:
+            if archive is not None:
+                archive.close()
+
+        for label, count in counts.items():
+            self.stdout.write(f'{label}: {count} deleted')
+        self.stdout.write(self.style.SUCCESS('Purge complete.'))
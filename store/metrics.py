@@ -0,0 +1,223 @@
+# store/metrics.py
+"""
+Lightweight, dependency-free metrics registry with Prometheus text exposition.
+
+Values live in plain per-process dicts guarded by a single lock, so recording
+a sample is a dict update. When ``METRICS_MULTIPROC_DIR`` is set, a background
+thread in every worker process snapshots its values every
+``METRICS_FLUSH_INTERVAL`` seconds to ``<dir>/<pid>-<start time>.json`` and the
+``/metrics`` view sums the snapshots of all workers. Samples therefore reach
+the exposition up to one flush interval late, and a worker killed with SIGKILL
+loses at most that much. Snapshots of exited workers keep being summed, so the
+directory must be emptied before the application (re)starts.
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_metrics = {}
+_process = {'pid': None, 'started': None, 'flusher_pid': None}
+
+
+class Counter:
+    """Monotonic counter, optionally split by label values."""
+    kind = 'counter'
+    suffix = '_total'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self, labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        _maybe_flush()
+
+    def samples(self, values):
+        for key, value in sorted(values.items()):
+            yield self.name + '_total', key, value
+
+
+class Histogram:
+    """Cumulative histogram with fixed upper bounds (in seconds)."""
+    kind = 'histogram'
+    suffix = ''
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}
+
+    def observe(self, amount, **labels):
+        key = _label_key(self, labels)
+        index = bisect_left(self.buckets, amount)
+        with _lock:
+            entry = self.values.get(key)
+            if entry is None:
+                # [count per bucket..., +Inf count, sum]
+                entry = self.values[key] = [0] * (len(self.buckets) + 2)
+            entry[index] += 1
+            entry[-1] += amount
+        _maybe_flush()
+
+    def samples(self, values):
+        for key, entry in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), entry[:-1]):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield self.name + '_bucket', key + (('le', le),), cumulative
+            yield self.name + '_count', key, cumulative
+            yield self.name + '_sum', key, entry[-1]
+
+
+def counter(name, documentation, labelnames=()):
+    return _register(Counter(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram(name, documentation, labelnames, buckets))
+
+
+def _register(metric):
+    with _lock:
+        return _metrics.setdefault(metric.name, metric)
+
+
+def _label_key(metric, labels):
+    return tuple((name, str(labels.get(name, ''))) for name in metric.labelnames)
+
+
+def _multiproc_dir():
+    return getattr(settings, 'METRICS_MULTIPROC_DIR', None) or os.environ.get('METRICS_MULTIPROC_DIR')
+
+
+def _snapshot():
+    """Copy of this process's values as ``{metric: [[labels, value], ...]}``."""
+    with _lock:
+        return {
+            name: [[list(key), value] for key, value in metric.values.items()]
+            for name, metric in _metrics.items()
+        }
+
+
+def _snapshot_name():
+    """Per-process file name; the start time keeps a reused pid from clobbering a dead worker."""
+    pid = os.getpid()
+    if _process['pid'] != pid:
+        _process['pid'] = pid
+        _process['started'] = time.time_ns()
+    return f"{pid}-{_process['started']}.json"
+
+
+def flush():
+    """Write this process's values to the shared directory, if one is set."""
+    directory = _multiproc_dir()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as fh:
+        json.dump(_snapshot(), fh)
+    os.replace(tmp_path, os.path.join(directory, _snapshot_name()))
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0))
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+def _maybe_flush():
+    """Start this process's flusher thread the first time it records a sample."""
+    if _process['flusher_pid'] == os.getpid() or not _multiproc_dir():
+        return
+    with _lock:
+        if _process['flusher_pid'] == os.getpid():
+            return
+        _process['flusher_pid'] = os.getpid()
+        threading.Thread(target=_flush_periodically, name='metrics-flush', daemon=True).start()
+
+
+atexit.register(flush)
+
+
+def _collect():
+    """Return ``{metric: {labels: value}}`` merged across worker processes."""
+    directory = _multiproc_dir()
+    if not directory:
+        with _lock:
+            return {name: dict(metric.values) for name, metric in _metrics.items()}
+
+    flush()
+    merged = {name: {} for name in _metrics}
+    for filename in os.listdir(directory):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as fh:
+                snapshot = json.load(fh)
+        except (OSError, ValueError):
+            continue
+        for name, rows in snapshot.items():
+            if name not in merged:
+                continue
+            target = merged[name]
+            for key, value in rows:
+                key = tuple(tuple(pair) for pair in key)
+                if isinstance(value, list):
+                    current = target.setdefault(key, [0] * len(value))
+                    target[key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target[key] = target.get(key, 0) + value
+    return merged
+
+
+def _format_labels(key):
+    if not key:
+        return ''
+    body = ','.join(
+        '{}="{}"'.format(name, value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in key
+    )
+    return '{' + body + '}'
+
+
+def render():
+    """Render every registered metric in the Prometheus text format."""
+    values = _collect()
+    lines = []
+    for name, metric in sorted(_metrics.items()):
+        # Text format 0.0.4 types the sample family, so counters are declared as <name>_total
+        family = name + metric.suffix
+        lines.append(f'# HELP {family} {metric.documentation}')
+        lines.append(f'# TYPE {family} {metric.kind}')
+        for sample_name, key, value in metric.samples(values.get(name, {})):
+            lines.append(f'{sample_name}{_format_labels(key)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+# Metrics recorded by the store app
+REQUESTS = counter('http_requests', 'HTTP requests by route, method and status.', ['view', 'method', 'status'])
+REQUEST_LATENCY = histogram('http_request_duration_seconds', 'Request latency by route.', ['view'])
+DB_LATENCY = histogram('db_query_duration_seconds', 'Time spent in database queries per request.', ['view'])
+DB_QUERIES = counter('db_queries', 'Database queries executed by route.', ['view'])
+ORDERS_CREATED = counter('orders_created', 'Orders placed through checkout.')
+CART_ADDS = counter('cart_adds', 'Movies added to a cart.')
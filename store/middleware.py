@@ -0,0 +1,40 @@
+# store/middleware.py
+import time
+
+from django.db import connection
+
+from . import metrics
+
+
+class MetricsMiddleware:
+    """Record request count, latency and database time per URL name."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db_time = [0.0, 0]
+
+        def record_query(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                db_time[0] += time.perf_counter() - start
+                db_time[1] += 1
+
+        start = time.perf_counter()
+        with connection.execute_wrapper(record_query):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        if view == 'metrics':
+            return response
+
+        metrics.REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        metrics.REQUEST_LATENCY.observe(elapsed, view=view)
+        metrics.DB_LATENCY.observe(db_time[0], view=view)
+        metrics.DB_QUERIES.inc(db_time[1], view=view)
+        return response
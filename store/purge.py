@@ -0,0 +1,175 @@
+# store/purge.py
+"""
+Batched purge of movies and users without loading whole cascades into memory.
+
+Django's ``delete()`` collects every related Review, Order and OrderItem row
+before deleting anything. These helpers instead delete children first, in
+pk-bounded batches with one short transaction each, so the final parent
+delete has nothing left to collect. Deleted rows can optionally be written to
+an archive file as JSON lines before they are removed; fields listed in
+``ARCHIVE_EXCLUDED_FIELDS`` (password hashes) are left out of it.
+"""
+import json
+import os
+from collections import Counter
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, QuerySet, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Movie, Review, Order, OrderItem
+
+DEFAULT_BATCH_SIZE = 500
+
+ARCHIVE_EXCLUDED_FIELDS = {
+    User._meta.label: {'password'},
+}
+
+
+def open_archive(path):
+    """Open ``path`` for appending, readable by its owner only."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+    os.fchmod(fd, 0o600)
+    return os.fdopen(fd, 'a')
+
+
+def _delete_in_batches(queryset, batch_size, archive=None, on_batch=None):
+    """Delete ``queryset`` in batches of ``batch_size`` rows; return rows deleted."""
+    model = queryset.model
+    label = model._meta.label
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            rows = list(queryset.order_by('pk').values()[:batch_size])
+            if not rows:
+                break
+            pks = [row['id'] for row in rows]
+            if archive is not None:
+                excluded = ARCHIVE_EXCLUDED_FIELDS.get(label, set())
+                for row in rows:
+                    fields = {name: value for name, value in row.items() if name not in excluded}
+                    archive.write(json.dumps({'model': label, 'fields': fields}, cls=DjangoJSONEncoder) + '\n')
+            model.objects.filter(pk__in=pks).delete()
+            if on_batch is not None:
+                on_batch(rows)
+        deleted += len(rows)
+    return deleted
+
+
+def recalculate_order_totals(order_ids):
+    """Recompute ``Order.total_amount`` from the order's remaining items."""
+    money = DecimalField(max_digits=10, decimal_places=2)
+    items_total = (
+        OrderItem.objects.filter(order=OuterRef('pk'))
+        .values('order')
+        .annotate(total=Sum(F('quantity') * F('price'), output_field=money))
+        .values('total')
+    )
+    return Order.objects.filter(pk__in=order_ids).update(
+        total_amount=Coalesce(Subquery(items_total), Value(Decimal('0.00')), output_field=money)
+    )
+
+
+def _id_chunks(ids, batch_size):
+    """Yield lists of at most ``batch_size`` ids from a queryset or an iterable of pks.
+
+    Querysets are paged by pk rather than materialized, so memory and the
+    number of bound SQL variables stay bounded however many rows match.
+    """
+    if isinstance(ids, QuerySet):
+        queryset = ids.order_by('pk').values_list('pk', flat=True)
+        last = None
+        while True:
+            page = queryset if last is None else queryset.filter(pk__gt=last)
+            chunk = list(page[:batch_size])
+            if not chunk:
+                return
+            yield chunk
+            last = chunk[-1]
+    else:
+        ids = iter(ids)
+        while chunk := list(islice(ids, batch_size)):
+            yield chunk
+
+
+def _id_filter(ids):
+    """Use a queryset as a subquery; materialize anything else."""
+    return ids.values('pk') if isinstance(ids, QuerySet) else list(ids)
+
+
+def _orders_emptied_by(movie_ids):
+    """Orders whose every item is for one of ``movie_ids``."""
+    return Order.objects.filter(items__movie_id__in=movie_ids).exclude(
+        pk__in=OrderItem.objects.exclude(movie_id__in=movie_ids).values('order_id')
+    ).distinct()
+
+
+def movie_purge_counts(movies):
+    """Rows :func:`purge_movies` would delete, as a ``{model label: count}`` dict."""
+    movie_ids = _id_filter(movies)
+    return {
+        Movie._meta.label: Movie.objects.filter(pk__in=movie_ids).count(),
+        Review._meta.label: Review.objects.filter(movie_id__in=movie_ids).count(),
+        OrderItem._meta.label: OrderItem.objects.filter(movie_id__in=movie_ids).count(),
+        Order._meta.label: _orders_emptied_by(movie_ids).count(),
+    }
+
+
+def purge_movies(movies, batch_size=DEFAULT_BATCH_SIZE, archive=None):
+    """Delete movies, given as a queryset or pks, with their reviews and order items.
+
+    An order left without items is deleted in the same batch as its last
+    item. An order that keeps other items stays, and its ``total_amount`` is
+    recalculated from those items so it always equals the sum of its items.
+    Returns a ``{model label: rows deleted}`` dict.
+    """
+    counts = Counter()
+
+    def fix_orders(rows):
+        order_ids = {row['order_id'] for row in rows}
+        emptied = Order.objects.filter(pk__in=order_ids, items__isnull=True)
+        counts[Order._meta.label] += _delete_in_batches(emptied, batch_size, archive)
+        recalculate_order_totals(order_ids)
+
+    for movie_ids in _id_chunks(movies, batch_size):
+        counts[Review._meta.label] += _delete_in_batches(
+            Review.objects.filter(movie_id__in=movie_ids), batch_size, archive)
+        counts[OrderItem._meta.label] += _delete_in_batches(
+            OrderItem.objects.filter(movie_id__in=movie_ids), batch_size, archive, on_batch=fix_orders)
+        counts[Movie._meta.label] += _delete_in_batches(
+            Movie.objects.filter(pk__in=movie_ids), batch_size, archive)
+    return dict(counts)
+
+
+def user_purge_counts(users):
+    """Rows :func:`purge_users` would delete, as a ``{model label: count}`` dict."""
+    user_ids = _id_filter(users)
+    return {
+        User._meta.label: User.objects.filter(pk__in=user_ids).count(),
+        Review._meta.label: Review.objects.filter(user_id__in=user_ids).count(),
+        Order._meta.label: Order.objects.filter(user_id__in=user_ids).count(),
+        OrderItem._meta.label: OrderItem.objects.filter(order__user_id__in=user_ids).count(),
+    }
+
+
+def purge_users(users, batch_size=DEFAULT_BATCH_SIZE, archive=None):
+    """Delete users, given as a queryset or pks, with their reviews, orders and order items.
+
+    Returns a ``{model label: rows deleted}`` dict.
+    """
+    counts = Counter()
+
+    for user_ids in _id_chunks(users, batch_size):
+        counts[Review._meta.label] += _delete_in_batches(
+            Review.objects.filter(user_id__in=user_ids), batch_size, archive)
+        counts[OrderItem._meta.label] += _delete_in_batches(
+            OrderItem.objects.filter(order__user_id__in=user_ids), batch_size, archive)
+        counts[Order._meta.label] += _delete_in_batches(
+            Order.objects.filter(user_id__in=user_ids), batch_size, archive)
+        counts[User._meta.label] += _delete_in_batches(
+            User.objects.filter(pk__in=user_ids), batch_size, archive)
+    return dict(counts)
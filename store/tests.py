@@ -1,3 +1,304 @@
-from django.test import TestCase
+import io
+import json
+import os
+import stat
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.admin.models import DELETION, LogEntry
+from django.contrib.auth.models import Permission, User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import metrics
+from .models import Movie, Review, Order, OrderItem
+from .purge import purge_movies, purge_users
+
+
+class HistogramTests(TestCase):
+    def test_bucket_placement_and_cumulative_samples(self):
+        histogram = metrics.Histogram('test_latency', 'Test.', ['view'], buckets=(0.1, 1.0))
+        for amount in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(amount, view='home')
+
+        samples = list(histogram.samples(histogram.values))
+        key = (('view', 'home'),)
+        self.assertEqual(samples, [
+            ('test_latency_bucket', key + (('le', '0.1'),), 2),
+            ('test_latency_bucket', key + (('le', '1.0'),), 3),
+            ('test_latency_bucket', key + (('le', '+Inf'),), 4),
+            ('test_latency_count', key, 4),
+            ('test_latency_sum', key, 3.65),
+        ])
+
+    def test_multiproc_snapshots_are_summed(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_MULTIPROC_DIR=directory):
+            before = metrics._collect()['cart_adds'].get((), 0)
+            with open(os.path.join(directory, '99999-1.json'), 'w') as fh:
+                json.dump({'cart_adds': [[[], 5]]}, fh)
+
+            self.assertEqual(metrics._collect()['cart_adds'][()], before + 5)
+            own = f'{os.getpid()}-{metrics._process["started"]}.json'
+            self.assertIn(own, os.listdir(directory))
+
+
+class MetricsViewTests(TestCase):
+    def setUp(self):
+        self.url = reverse('metrics')
+
+    def test_anonymous_loopback_request_is_forbidden(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_staff_can_read_metrics(self):
+        staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        self.client.force_login(staff)
+        self.client.get(reverse('home'))
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('# TYPE http_requests_total counter\n', body)
+        self.assertIn('# TYPE http_request_duration_seconds histogram\n', body)
+        self.assertIn('http_requests_total{view="home",method="GET",status="200"}', body)
+
+    @override_settings(METRICS_BEARER_TOKEN='s3cret')
+    def test_bearer_token(self):
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.5'])
+    def test_allowed_ip(self):
+        self.assertEqual(self.client.get(self.url, REMOTE_ADDR='10.0.0.5').status_code, 200)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.movie = Movie.objects.create(title='Jaws', description='', price=Decimal('5.00'), image='movies/x.jpg')
+        self.user = User.objects.create_user('alice', password='pw')
+        self.url = reverse('movie_detail', args=[self.movie.pk])
+
+    def etag(self):
+        return self.client.get(self.url)['ETag']
+
+    def test_repeat_get_returns_304_without_rendering(self):
+        etag = self.etag()
+        self.assertTrue(etag.startswith('W/"'))
+
+        # Only the movie timestamp and the review aggregate are queried
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_revalidates(self):
+        url = reverse('movie_list')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_etag_changes_with_movie_and_reviews(self):
+        first = self.etag()
+        review = Review.objects.create(user=self.user, movie=self.movie, content='ok', rating=3)
+        second = self.etag()
+        review.rating = 5
+        review.save()
+        third = self.etag()
+        self.movie.save()
+        fourth = self.etag()
+        self.assertEqual(len({first, second, third, fourth}), 4)
+
+    def test_varies_on_cookie_and_viewer(self):
+        response = self.client.get(self.url)
+        self.assertIn('Cookie', response['Vary'])
+        self.client.force_login(self.user)
+        self.assertNotEqual(self.etag(), response['ETag'])
+
+    def test_login_rotates_etag(self):
+        self.client.force_login(self.user)
+        before = self.etag()
+        self.client.logout()
+        self.client.force_login(self.user)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=before)
+        self.assertEqual(response.status_code, 200)
+
+    def test_pending_messages_skip_validation(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('add_to_cart', args=[self.movie.pk]), {'quantity': 1})
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        self.assertContains(response, 'Added 1 Jaws to cart.')
+
+
+class PurgeTestMixin:
+    def make_movie(self, title, price='5.00'):
+        return Movie.objects.create(title=title, description='', price=Decimal(price), image='movies/x.jpg')
+
+    def make_order(self, user, *items):
+        order = Order.objects.create(user=user, total_amount=0)
+        for movie, quantity in items:
+            OrderItem.objects.create(order=order, movie=movie, quantity=quantity, price=movie.price)
+        order.total_amount = sum(item.subtotal() for item in order.items.all())
+        order.save()
+        return order
+
+
+class PurgeTests(PurgeTestMixin, TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='pw')
+        self.bob = User.objects.create_user('bob', password='pw')
+        self.jaws = self.make_movie('Jaws', '5.00')
+        self.alien = self.make_movie('Alien', '7.50')
+
+    def test_purge_movies_with_batch_size_one(self):
+        Review.objects.create(user=self.alice, movie=self.jaws, content='a', rating=5)
+        Review.objects.create(user=self.bob, movie=self.jaws, content='b', rating=4)
+        self.make_order(self.alice, (self.jaws, 1))
+        self.make_order(self.bob, (self.jaws, 2))
+        self.make_order(self.bob, (self.jaws, 3))
+
+        counts = purge_movies([self.jaws.pk], batch_size=1)
+
+        self.assertEqual(counts, {'store.Review': 2, 'store.OrderItem': 3, 'store.Order': 3, 'store.Movie': 1})
+        self.assertFalse(Movie.objects.filter(pk=self.jaws.pk).exists())
+        self.assertEqual(Review.objects.count(), 0)
+        self.assertEqual(OrderItem.objects.count(), 0)
+
+    def test_purge_movies_recalculates_or_deletes_orders(self):
+        mixed = self.make_order(self.alice, (self.jaws, 2), (self.alien, 1))
+        jaws_only = self.make_order(self.bob, (self.jaws, 1))
+
+        purge_movies([self.jaws.pk])
+
+        mixed.refresh_from_db()
+        self.assertEqual(mixed.total_amount, Decimal('7.50'))
+        self.assertFalse(Order.objects.filter(pk=jaws_only.pk).exists())
+
+    def test_purge_users_cascade(self):
+        Review.objects.create(user=self.alice, movie=self.jaws, content='a', rating=5)
+        self.make_order(self.alice, (self.jaws, 1), (self.alien, 1))
+        self.make_order(self.alice, (self.alien, 1))
+        kept = self.make_order(self.bob, (self.jaws, 1))
+
+        counts = purge_users([self.alice.pk], batch_size=1)
+
+        self.assertEqual(counts, {'store.Review': 1, 'store.OrderItem': 3, 'store.Order': 2, 'auth.User': 1})
+        self.assertEqual(list(Order.objects.all()), [kept])
+        self.assertTrue(User.objects.filter(pk=self.bob.pk).exists())
+
+    def test_purge_users_from_queryset_in_chunks(self):
+        for name in ('carol', 'dave', 'erin'):
+            Review.objects.create(user=User.objects.create_user(name, password='pw'), movie=self.jaws,
+                                  content='x', rating=3)
+
+        counts = purge_users(User.objects.exclude(username='bob'), batch_size=1)
+
+        self.assertEqual(counts['auth.User'], 4)
+        self.assertEqual(counts['store.Review'], 3)
+        self.assertEqual(list(User.objects.values_list('username', flat=True)), ['bob'])
+
+    def test_many_ids_stay_under_sql_variable_limit(self):
+        counts = purge_users(range(1, 40001))
+        self.assertEqual(counts['auth.User'], 2)
+
+
+class PurgeCommandTests(PurgeTestMixin, TestCase):
+    def test_archive_output(self):
+        user = User.objects.create_user('carol', email='carol@example.com', password='pw')
+        movie = self.make_movie('Heat')
+        Review.objects.create(user=user, movie=movie, content='great', rating=5)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'archive.jsonl')
+            call_command('purge', user=[user.pk], movies=[movie.pk], archive=path, interactive=False, stdout=io.StringIO())
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+            with open(path) as fh:
+                rows = [json.loads(line) for line in fh]
+
+        self.assertEqual([row['model'] for row in rows], ['store.Review', 'store.Movie', 'auth.User'])
+        self.assertEqual(rows[0]['fields']['content'], 'great')
+        self.assertEqual(rows[2]['fields']['username'], 'carol')
+        self.assertNotIn('password', rows[2]['fields'])
+
+    def test_inactive_days_skips_staff_and_superusers(self):
+        long_ago = timezone.now() - timedelta(days=400)
+        idle = User.objects.create_user('idle', password='pw', last_login=long_ago)
+        User.objects.create_user('staff', password='pw', is_staff=True, last_login=long_ago)
+        User.objects.create_superuser('root', password='pw', last_login=long_ago)
+        User.objects.create_user('recent', password='pw', last_login=timezone.now())
+
+        call_command('purge', inactive_days=365, interactive=False, stdout=io.StringIO())
+
+        self.assertFalse(User.objects.filter(pk=idle.pk).exists())
+        self.assertEqual(sorted(User.objects.values_list('username', flat=True)), ['recent', 'root', 'staff'])
+
+
+class PurgeCommandConfirmationTests(PurgeTestMixin, TestCase):
+    def setUp(self):
+        self.movie = self.make_movie('Heat')
+
+    def test_dry_run_only_reports(self):
+        out = io.StringIO()
+        call_command('purge', movies=[self.movie.pk], dry_run=True, stdout=out)
+        self.assertIn('store.Movie: 1 to delete', out.getvalue())
+        self.assertTrue(Movie.objects.filter(pk=self.movie.pk).exists())
+
+    def test_prompt_can_cancel(self):
+        with mock.patch('builtins.input', return_value='no'):
+            call_command('purge', movies=[self.movie.pk], stdout=io.StringIO())
+        self.assertTrue(Movie.objects.filter(pk=self.movie.pk).exists())
+
+    def test_prompt_confirms(self):
+        with mock.patch('builtins.input', return_value='yes'):
+            call_command('purge', movies=[self.movie.pk], stdout=io.StringIO())
+        self.assertFalse(Movie.objects.filter(pk=self.movie.pk).exists())
+
+
+class PurgeAdminActionTests(PurgeTestMixin, TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_user('manager', password='pw', is_staff=True)
+        self.client.force_login(self.admin_user)
+        self.movie = self.make_movie('Jaws')
+        self.make_order(User.objects.create_user('alice', password='pw'), (self.movie, 1))
+        self.url = reverse('admin:store_movie_changelist')
+
+    def grant(self, *codenames):
+        self.admin_user.user_permissions.add(*Permission.objects.filter(codename__in=codenames))
+
+    def post_action(self, confirm):
+        data = {'action': 'purge_selected', '_selected_action': [self.movie.pk]}
+        if confirm:
+            data['post'] = 'yes'
+        return self.client.post(self.url, data)
+
+    def test_requires_delete_permission_on_cascaded_models(self):
+        self.grant('view_movie', 'delete_movie')
+
+        response = self.post_action(confirm=True)
+
+        self.assertContains(response, 'order items')
+        self.assertTrue(Movie.objects.filter(pk=self.movie.pk).exists())
+        self.assertEqual(OrderItem.objects.count(), 1)
+
+    def test_confirms_then_purges_and_logs(self):
+        self.grant('view_movie', 'delete_movie', 'delete_review', 'delete_orderitem', 'delete_order')
+
+        response = self.post_action(confirm=False)
+        self.assertContains(response, 'store.OrderItem: 1')
+        self.assertTrue(Movie.objects.filter(pk=self.movie.pk).exists())
+
+        response = self.post_action(confirm=True)
+        self.assertRedirects(response, self.url)
+        self.assertFalse(Movie.objects.filter(pk=self.movie.pk).exists())
+        self.assertTrue(LogEntry.objects.filter(object_id=str(self.movie.pk), action_flag=DELETION).exists())
+
+    def test_cannot_purge_own_account(self):
+        self.grant('view_user', 'delete_user')
+
+        self.client.post(reverse('admin:auth_user_changelist'), {
+            'action': 'purge_selected', '_selected_action': [self.admin_user.pk], 'post': 'yes',
+        })
+
+        self.assertTrue(User.objects.filter(pk=self.admin_user.pk).exists())
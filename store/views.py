@@ -1,8 +1,16 @@
 # store/views.py
+import hashlib
+import hmac
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
+from . import metrics
 from .models import Movie, Review, Order, OrderItem
 from .forms import UserRegistrationForm, ReviewForm
 
@@ -21,6 +29,41 @@ def register(request):
         form = UserRegistrationForm()
     return render(request, 'store/register.html', {'form': form})
 
+def _user_tag(request):
+    """Identify the viewer and the CSRF secret their forms embed; login rotates both"""
+    csrf_secret = request.META.get('CSRF_COOKIE') or request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    session_key = request.session.session_key or ''
+    digest = hashlib.sha256(f'{csrf_secret}|{session_key}'.encode()).hexdigest()[:16]
+    if request.user.is_authenticated:
+        return f'u{request.user.pk}-{digest}'
+    return f'anon-{digest}'
+
+def _has_pending_messages(request):
+    """Flash messages are rendered once, so pages carrying them must not be revalidated"""
+    return bool(messages.get_messages(request))
+
+def movie_list_etag(request):
+    """Weak catalog validator built from the newest Movie.updated_at and the movie count"""
+    if _has_pending_messages(request):
+        return None
+    catalog = Movie.objects.aggregate(latest=Max('updated_at'), count=Count('id'))
+    latest = catalog['latest'].timestamp() if catalog['latest'] else 0
+    # Weak: each render masks the CSRF token differently, so bodies are not byte-identical
+    return 'W/"list-{}-{}-{}"'.format(latest, catalog['count'], _user_tag(request))
+
+def movie_detail_etag(request, pk):
+    """Weak validator built from Movie.updated_at and the latest review timestamp"""
+    if _has_pending_messages(request):
+        return None
+    updated_at = Movie.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None
+    reviews = Review.objects.filter(movie_id=pk).aggregate(latest=Max('updated_at'), count=Count('id'))
+    latest = reviews['latest'].timestamp() if reviews['latest'] else 0
+    return 'W/"movie-{}-{}-{}-{}-{}"'.format(pk, updated_at.timestamp(), latest, reviews['count'], _user_tag(request))
+
+@vary_on_cookie
+@condition(etag_func=movie_list_etag)
 def movie_list(request):
     """Movie list view with search functionality - User Stories #4, #5"""
     movies = Movie.objects.all()
@@ -35,6 +78,8 @@ def movie_list(request):
         'search_query': search_query
     })
 
+@vary_on_cookie
+@condition(etag_func=movie_detail_etag)
 def movie_detail(request, pk):
     """Movie detail view with reviews - User Stories #8, #12, #13"""
     movie = get_object_or_404(Movie, pk=pk)
@@ -136,6 +181,7 @@ def add_to_cart(request, movie_id):
         cart[str(movie_id)] = quantity
 
     update_cart(request, cart)
+    metrics.CART_ADDS.inc(quantity)
     messages.success(request, f'Added {quantity} {movie.title} to cart.')
     return redirect('movie_detail', pk=movie_id)
 
@@ -201,6 +247,7 @@ def checkout(request):
     # Update order total
     order.total_amount = total
     order.save()
+    metrics.ORDERS_CREATED.inc()
 
     # Clear cart
     request.session['cart'] = {}
@@ -213,4 +260,20 @@ def checkout(request):
 def order_list(request):
     """View order history - User Story #14"""
     orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'store/order_list.html', {'orders': orders})
\ No newline at end of file
+    return render(request, 'store/order_list.html', {'orders': orders})
+
+def _metrics_access_allowed(request):
+    """Staff, a configured bearer token, or an explicitly allow-listed address"""
+    if request.user.is_staff:
+        return True
+    token = getattr(settings, 'METRICS_BEARER_TOKEN', None)
+    auth = request.META.get('HTTP_AUTHORIZATION', '')
+    if token and auth.startswith('Bearer ') and hmac.compare_digest(auth[len('Bearer '):], token):
+        return True
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', [])
+
+def metrics_view(request):
+    """Expose runtime metrics in the Prometheus text format"""
+    if not _metrics_access_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
\ No newline at end of file